@@ -0,0 +1,1416 @@
+"""Offline benchmarks for 98kTools.py.
+
+Everything runs against local stand-ins, no traffic leaves the machine:
+
+    python benchmarks.py                  # run every benchmark, compare with the baseline
+    python benchmarks.py portscan         # run only the named ones
+    python benchmarks.py --save-baseline  # record this run as the new baseline
+
+Each benchmark runs in its own interpreter and reports throughput, p50/p99 latency where
+it times single operations, and the process's peak RSS. The run fails (exit status 1) when
+a benchmark's checks fail or a metric is worse than the baseline by more than the tolerance.
+"""
+import asyncio
+import gzip
+import http.server
+import importlib.util
+import ipaddress
+import json
+import math
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_tool():
+    # 98kTools.py is not an importable module name, load it by path
+    spec = importlib.util.spec_from_file_location("tool98k", os.path.join(HERE, "98kTools.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so worker processes can pickle references to its functions
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class ListenerFarm:
+    """A set of listening TCP sockets on localhost, plus ports known to be closed or blackholed.
+
+    A blackholed port is a listener with a zero-length backlog that already holds one
+    connection nobody accepts: the kernel drops further SYNs, so probes time out the way
+    they do against a filtering firewall.
+    """
+
+    def __init__(self, open_count, closed_count=0, blackholed_count=0, host="127.0.0.1"):
+        self.host = host
+        self.open_count = open_count
+        self.closed_count = closed_count
+        self.blackholed_count = blackholed_count
+        self.sockets = []
+        self.open_ports = []
+        self.closed_ports = []
+        self.blackholed_ports = []
+
+    def __enter__(self):
+        for _ in range(self.open_count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind((self.host, 0))
+            sock.listen(128)
+            self.sockets.append(sock)
+            self.open_ports.append(sock.getsockname()[1])
+        for _ in range(self.blackholed_count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind((self.host, 0))
+            sock.listen(0)
+            filler = socket.create_connection(sock.getsockname(), timeout=1)
+            self.sockets += [sock, filler]
+            self.blackholed_ports.append(sock.getsockname()[1])
+        # Bind-and-release gives ports nothing is listening on
+        taken = set(self.open_ports + self.blackholed_ports)
+        for _ in range(self.closed_count):
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind((self.host, 0))
+                port = sock.getsockname()[1]
+            if port not in taken:
+                taken.add(port)
+                self.closed_ports.append(port)
+        return self
+
+    def __exit__(self, *exc):
+        for sock in self.sockets:
+            sock.close()
+
+    def ports(self):
+        return array("H", sorted(set(self.open_ports + self.closed_ports + self.blackholed_ports)))
+
+
+# Metrics of every report() in this process, keyed by report name; main() compares them
+# against the stored baseline
+RESULTS = {}
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile of an already sorted list
+    return samples[min(len(samples) - 1, max(0, math.ceil(fraction * len(samples)) - 1))]
+
+
+def report(name, count, elapsed, latencies=None, **extra):
+    # latencies: optional per-operation timings in seconds, summarised as p50/p99
+    rate = count / elapsed if elapsed else float("inf")
+    metrics = RESULTS[name] = {"ops_per_s": round(rate, 1)}
+    if latencies:
+        samples = sorted(latencies)
+        metrics["p50_ms"] = round(percentile(samples, 0.50) * 1000, 3)
+        metrics["p99_ms"] = round(percentile(samples, 0.99) * 1000, 3)
+        extra = dict(p50_ms=metrics["p50_ms"], p99_ms=metrics["p99_ms"], **extra)
+    details = "".join(f"  {key}={value}" for key, value in extra.items())
+    print(f"{name:<24} {count:>8} ops  {elapsed:8.3f}s  {rate:12.1f} ops/s{details}", flush=True)
+
+
+def timed(samples, func):
+    # Wrap func so every call appends its duration to samples
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def timed_async(samples, func):
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def bench_portscan(tool, open_count=300, closed_count=1700, concurrency=500):
+    samples = []
+    with ListenerFarm(open_count, closed_count) as farm:
+        ports = farm.ports()
+        start = time.perf_counter()
+        results = asyncio.run(tool.scan_async(farm.host, ports, concurrency=concurrency,
+                                              probe=timed_async(samples, tool._probe_port)))
+        elapsed = time.perf_counter() - start
+
+    found = len(results[tool.PORT_OPEN])
+    if found != open_count:
+        raise AssertionError(f"portscan: expected {open_count} open ports, found {found}")
+    report("portscan", len(ports), elapsed, latencies=samples, open=found, concurrency=concurrency)
+
+
+def bench_portscan_blackhole(tool, open_count=50, closed_count=400, blackholed_count=50):
+    # Blackholed ports must come out filtered after their retry, without slowing the
+    # answers from the open and closed ones
+    samples = []
+    with ListenerFarm(open_count, closed_count, blackholed_count) as farm:
+        ports = farm.ports()
+        start = time.perf_counter()
+        results = asyncio.run(tool.scan_async(farm.host, ports, probe=timed_async(samples, tool._probe_port)))
+        elapsed = time.perf_counter() - start
+        expected = (len(farm.open_ports), len(farm.closed_ports), len(farm.blackholed_ports))
+
+    found = tuple(len(results[state]) for state in (tool.PORT_OPEN, tool.PORT_CLOSED, tool.PORT_FILTERED))
+    if found != expected:
+        raise AssertionError(f"portscan-blackhole: expected open/closed/filtered {expected}, got {found}")
+    report("portscan-blackhole", len(ports), elapsed, latencies=samples, filtered=found[2])
+
+
+def latency_probe(tool, latency, jitter=0.0, drop_every=0):
+    """Wrap the real connect probe with artificial RTT and deterministic first-probe loss.
+
+    With ``drop_every=N`` the first attempt at every Nth port is silently dropped, so the
+    engine has to recover it through its retry pass.
+    """
+    attempts = {}
+
+    async def probe(ip, port, timeout, grab=None):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        attempt = attempts[port] = attempts.get(port, -1) + 1
+        delay = latency + random.uniform(0, jitter)
+        if (drop_every and attempt == 0 and port % drop_every == 0) or delay >= timeout:
+            await asyncio.sleep(timeout)
+            return tool.PORT_FILTERED, None
+        await asyncio.sleep(delay)
+        state, rtt = await tool._probe_port(ip, port, timeout - delay, grab)
+        return state, (loop.time() - start if rtt is not None else None)
+
+    return probe
+
+
+def bench_portscan_latency(tool, open_count=100, closed_count=1900, latency=0.05, jitter=0.02, drop_every=25):
+    with ListenerFarm(open_count, closed_count) as farm:
+        ports = farm.ports()
+        probe = latency_probe(tool, latency, jitter, drop_every)
+        start = time.perf_counter()
+        results = asyncio.run(tool.scan_async(farm.host, ports, profile="normal", probe=probe))
+        elapsed = time.perf_counter() - start
+
+    found = len(results[tool.PORT_OPEN])
+    filtered = len(results[tool.PORT_FILTERED])
+    if found != open_count or filtered:
+        raise AssertionError(f"portscan-latency: expected {open_count} open / 0 filtered, got {found} / {filtered}")
+    report("portscan-latency", len(ports), elapsed, open=found, rtt_ms=int(latency * 1000))
+
+
+def bench_portscan_hosts(tool, cidr="127.0.0.0/26", open_count=20, closed_count=480):
+    # Listeners live on 127.0.0.1 only, every other loopback address answers with RSTs
+    with ListenerFarm(open_count, closed_count) as farm:
+        ports = farm.ports()
+        start = time.perf_counter()
+        results = list(tool.scan_hosts(cidr, ports))
+        elapsed = time.perf_counter() - start
+
+    found = sum(result.count(tool.PORT_OPEN) for result in results)
+    if found != open_count:
+        raise AssertionError(f"portscan-hosts: expected {open_count} open ports, found {found}")
+    report("portscan-hosts", len(results) * len(ports), elapsed, hosts=len(results), workers=os.cpu_count())
+
+
+# Stub services for the banner stage: greeting-first protocols, HTTP, a fake TLS endpoint
+# that answers any ClientHello with a TLS 1.2 ServerHello header, and a silent one.
+BANNER_STUBS = {
+    "ssh": (b"SSH-2.0-OpenSSH_9.6\r\n", None),
+    "smtp": (b"220 mail.test ESMTP Postfix\r\n", None),
+    "ftp": (b"220 (vsFTPd 3.0.5)\r\n", None),
+    "http": (None, b"HTTP/1.1 200 OK\r\nServer: stub/1.0\r\nContent-Length: 0\r\n\r\n"),
+    "tls": (None, b"\x16\x03\x03\x00\x31\x02\x00\x00\x2d\x03\x03" + bytes(32)),
+    "unknown": (None, None),
+}
+
+
+async def start_banner_stubs(copies):
+    servers, expected = [], {}
+    for name, (greeting, reply) in BANNER_STUBS.items():
+        async def handle(reader, writer, greeting=greeting, reply=reply):
+            try:
+                if greeting:
+                    writer.write(greeting)
+                    await writer.drain()
+                if reply and await reader.read(1024):
+                    writer.write(reply)
+                    await writer.drain()
+                await reader.read(1024)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        for _ in range(copies):
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            servers.append(server)
+            expected[server.sockets[0].getsockname()[1]] = name
+    return servers, expected
+
+
+def bench_banners(tool, copies=40):
+    async def run():
+        servers, expected = await start_banner_stubs(copies)
+        # The fake TLS stubs sit on random ports, tell the scanner to speak TLS there
+        tool.TLS_PORTS.update(port for port, name in expected.items() if name == "tls")
+        ports = array("H", sorted(expected))
+        start = time.perf_counter()
+        results = await tool.scan_async("127.0.0.1", ports, banners=True)
+        elapsed = time.perf_counter() - start
+        for server in servers:
+            server.close()
+        return expected, results, elapsed
+
+    expected, results, elapsed = asyncio.run(run())
+    wrong = {port: (name, results.services.get(port)) for port, name in expected.items()
+             if name != "unknown" and (results.services.get(port) or ("?",))[0] != name}
+    if wrong:
+        raise AssertionError(f"banners: misclassified {len(wrong)} services, e.g. {next(iter(wrong.values()))}")
+    report("banners", len(expected), elapsed, services=len(BANNER_STUBS))
+
+
+class StubDNSServer:
+    """Authoritative-style DNS stand-in on localhost (UDP and TCP on the same port).
+
+    ``zone`` maps (name, type) -> list of (ttl, value) with values written the way the
+    resolver prints them; unknown names get NXDOMAIN with an SOA for negative caching.
+    UDP answers larger than ``udp_limit`` are truncated so clients have to retry over TCP.
+    Runs on its own thread and event loop so blocking callers can use it too.
+    """
+
+    def __init__(self, tool, zone, latency=0.0, udp_limit=512, host="127.0.0.1"):
+        self.tool = tool
+        self.zone = {(name.lower().rstrip("."), rtype): records for (name, rtype), records in zone.items()}
+        self.names = {name for name, _ in self.zone}
+        self.latency = latency
+        self.udp_limit = udp_limit
+        self.host = host
+        self.port = None
+        self.queries = 0
+        self._loop = asyncio.new_event_loop()
+
+    def _rdata(self, rtype, value):
+        tool = self.tool
+        if rtype == "A":
+            return socket.inet_aton(value)
+        if rtype == "AAAA":
+            return socket.inet_pton(socket.AF_INET6, value)
+        if rtype in ("NS", "CNAME", "PTR"):
+            return tool._dns_encode_name(value)
+        if rtype == "MX":
+            preference, exchange = value.split()
+            return int(preference).to_bytes(2, "big") + tool._dns_encode_name(exchange)
+        if rtype == "TXT":
+            raw = value.encode()
+            return b"".join(bytes([len(raw[i:i + 255])]) + raw[i:i + 255] for i in range(0, len(raw), 255))
+        if rtype == "SOA":
+            mname, rname, *numbers = value.split()
+            return tool._dns_encode_name(mname) + tool._dns_encode_name(rname) + struct.pack("!IIIII", *map(int, numbers))
+        raise ValueError(rtype)
+
+    def answer(self, query, tcp=False):
+        self.queries += 1
+        query_id = int.from_bytes(query[:2], "big")
+        name, offset = self.tool._dns_read_name(query, 12)
+        qtype = int.from_bytes(query[offset:offset + 2], "big")
+        question = query[12:offset + 4]
+        rtype = self.tool.DNS_TYPE_NAMES.get(qtype)
+        name = name.lower()
+
+        rcode = 0 if name in self.names else 3
+        answers = [(name, rtype, ttl, value) for ttl, value in self.zone.get((name, rtype), [])]
+        authority = [] if answers else [(name, "SOA", 300, f"ns.stub. admin.stub. 1 3600 600 86400 60")]
+        body = b""
+        for owner, record_type, ttl, value in answers + authority:
+            rdata = self._rdata(record_type, value)
+            body += self.tool._dns_encode_name(owner) + struct.pack("!HHIH", self.tool.DNS_TYPES[record_type], 1, ttl, len(rdata)) + rdata
+
+        flags = 0x8180 | rcode
+        response = struct.pack("!HHHHHH", query_id, flags, 1, len(answers), len(authority), 0) + question + body
+        if not tcp and len(response) > self.udp_limit:
+            response = struct.pack("!HHHHHH", query_id, flags | 0x0200, 1, 0, 0, 0) + question
+        return response
+
+    def __enter__(self):
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                response = server.answer(data)
+                if server.latency:
+                    server._loop.call_later(server.latency, self.transport.sendto, response, addr)
+                else:
+                    self.transport.sendto(response, addr)
+
+        async def handle_tcp(reader, writer):
+            try:
+                while True:
+                    length = int.from_bytes(await reader.readexactly(2), "big")
+                    response = server.answer(await reader.readexactly(length), tcp=True)
+                    writer.write(len(response).to_bytes(2, "big") + response)
+                    await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                writer.close()
+
+        async def start():
+            self._udp, _ = await self._loop.create_datagram_endpoint(Protocol, local_addr=(self.host, 0))
+            self.port = self._udp.get_extra_info("sockname")[1]
+            self._tcp = await asyncio.start_server(handle_tcp, self.host, self.port)
+
+        self._loop.run_until_complete(start())
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        def stop():
+            self._udp.close()
+            self._tcp.close()
+            self._loop.stop()
+
+        self._loop.call_soon_threadsafe(stop)
+        self._thread.join()
+
+
+def dns_zone(count):
+    zone = {}
+    for i in range(count):
+        name = f"host{i}.bench.test"
+        zone[(name, "A")] = [(300, f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}")]
+        zone[(name, "AAAA")] = [(300, f"fd00::{i:x}")]
+        zone[(name, "MX")] = [(3600, f"10 mail.{name}")]
+        zone[(name, "NS")] = [(3600, "ns1.bench.test"), (3600, "ns2.bench.test")]
+        zone[(name, "TXT")] = [(300, "v=spf1 -all")]
+        zone[(name, "SOA")] = [(3600, "ns1.bench.test admin.bench.test 1 3600 600 86400 60")]
+    # Bigger than 512 bytes: forces the truncation + TCP fallback path
+    zone[("host0.bench.test", "TXT")] = [(300, "x" * 800)]
+    return zone
+
+
+def bench_dns(tool, names=200, latency=0.005):
+    samples = []
+    with StubDNSServer(tool, dns_zone(names), latency=latency) as server:
+        async def run():
+            async with tool.DNSResolver(server.host, server.port, timeout=1.0) as resolver:
+                resolve = timed_async(samples, resolver.resolve_all)
+                return await asyncio.gather(*(resolve(f"host{i}.bench.test") for i in range(names)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+    queries = names * len(tool.DNS_LOOKUP_TYPES)
+    errors = sum(isinstance(response, Exception) for result in results for response in result.values())
+    if errors or results[5]["A"].answers[0].value != "10.0.0.5" or len(results[0]["TXT"].answers[0].value) != 800:
+        raise AssertionError(f"dns: {errors} failed queries or wrong answers")
+    report("dns", queries, elapsed, latencies=samples, names=names, rtt_ms=latency * 1000)
+
+
+def bench_dns_bulk(tool, names=500, repeats=4, latency=0.005):
+    # Every name appears `repeats` times plus a batch of unknown ones: after the first pass
+    # only the cache should answer, NXDOMAIN included
+    lines = [f"host{i}.bench.test\n" for i in range(names)] + [f"missing{i}.bench.test\n" for i in range(names // 10)]
+    lines = lines * repeats
+    results = {}
+    tool.dns_cache.entries.clear()
+    with StubDNSServer(tool, dns_zone(names), latency=latency) as server:
+        start = time.perf_counter()
+        asyncio.run(tool.bulk_resolve(lines, ("A", "AAAA"), server.host, port=server.port,
+                                      on_result=lambda name, result: results.setdefault(name, result)))
+        elapsed = time.perf_counter() - start
+        queries = server.queries
+
+    unique = len(results) * 2
+    if results["host7.bench.test"]["A"].answers[0].value != "10.0.0.7" or results["missing0.bench.test"]["A"].rcode != 3:
+        raise AssertionError("dns-bulk: wrong answers")
+    # Concurrent workers may race on a name's first lookup, but never past the first pass
+    if queries > unique * 1.5:
+        raise AssertionError(f"dns-bulk: {queries} upstream queries for {unique} distinct questions")
+    report("dns-bulk", len(lines), elapsed, upstream_queries=queries, cache_hits=tool.dns_cache.hits)
+
+
+def bench_dns_sweep(tool, cidr="10.1.0.0/20", named_every=7, latency=0.005):
+    # Every 7th address has a PTR record, the rest are NXDOMAIN like most real ranges
+    network = ipaddress.ip_network(cidr)
+    zone = {(address.reverse_pointer, "PTR"): [(3600, f"h{i}.bench.test")]
+            for i, address in enumerate(network.hosts()) if i % named_every == 0}
+    found = {}
+    errors = []
+
+    def on_result(ip, names, error):
+        if error:
+            errors.append((ip, error))
+        for name in names:
+            found[ip] = name
+
+    with StubDNSServer(tool, zone, latency=latency) as server:
+        start = time.perf_counter()
+        asyncio.run(tool.ptr_sweep(network, server.host, on_result=on_result, port=server.port))
+        elapsed = time.perf_counter() - start
+
+    total = network.num_addresses - 2
+    if errors or len(found) != len(zone) or found[str(network[1])] != "h0.bench.test":
+        raise AssertionError(f"dns-sweep: {len(errors)} errors, {len(found)}/{len(zone)} names")
+    report("dns-sweep", total, elapsed, cidr=cidr, named=len(found), rtt_ms=latency * 1000)
+
+
+class StubIPAPI:
+    """ip-api stand-in: GET /json/<ip> and POST /batch with the real per-window request
+    limit and headers, each answer delayed by `latency` seconds.
+
+    Answers each address with a fixed fake location, counts requests and 429s.
+    """
+
+    def __init__(self, limit=15, window=1.0, latency=0.02, host="127.0.0.1"):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.host = host
+        self.requests = 0
+        self.rejected = 0
+        self._window_start = time.monotonic()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def handle(self, handler):
+        if handler.command == "GET":
+            # /json/<ip>?fields=... answers one object instead of a list
+            queries = handler.path.split("?")[0].rsplit("/", 1)[-1]
+        else:
+            queries = json.loads(handler.rfile.read(int(handler.headers.get("Content-Length", 0))))
+        time.sleep(self.latency)
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start, self._used = now, 0
+            self._used += 1
+            self.requests += 1
+            remaining = self.limit - self._used
+            ttl = max(0, math.ceil(self._window_start + self.window - now))
+            if remaining < 0:
+                self.rejected += 1
+        if remaining < 0:
+            body = b""
+            status = 429
+        else:
+            records = [self.record(query) for query in queries] if isinstance(queries, list) else self.record(queries)
+            body = json.dumps(records).encode()
+            status = 200
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("X-Rl", str(max(remaining, 0)))
+        handler.send_header("X-Ttl", str(ttl))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    @staticmethod
+    def record(query):
+        return {"status": "success", "query": query, "country": "Benchland", "city": "Stub",
+                "isp": "Loopback", "as": "AS64512", "proxy": False, "hosting": True}
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            wbufsize = 1 << 16
+
+            def do_GET(self):
+                stub.handle(self)
+
+            def do_POST(self):
+                stub.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{self.host}:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class StubHTTP:
+    """Keep-alive HTTP/1.1 stand-in for the shared client.
+
+    Every new connection pays `handshake` seconds (standing in for TCP+TLS setup) and every
+    request `latency`. /flaky/<key> answers 503 the first time a key is seen, /limited/<key>
+    answers 429 with Retry-After: `retry_after` the first time. Counts connections, requests
+    and the most requests ever handled at once.
+    """
+
+    def __init__(self, handshake=0.003, latency=0.002, retry_after=0.2, host="127.0.0.1"):
+        self.handshake = handshake
+        self.latency = latency
+        self.retry_after = retry_after
+        self.host = host
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+        self.seen = set()
+        self._lock = threading.Lock()
+
+    def handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            first = handler.path not in self.seen
+            self.seen.add(handler.path)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        headers = {}
+        if handler.path.startswith("/flaky/") and first:
+            status = 503
+        elif handler.path.startswith("/limited/") and first:
+            status, headers = 429, {"Retry-After": str(self.retry_after)}
+        else:
+            status = 200
+        body = json.dumps({"path": handler.path, "status": status}).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body leave in one segment; unbuffered writes would hit Nagle plus
+            # delayed ACK (~40 ms) on every keep-alive request
+            wbufsize = 1 << 16
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+                time.sleep(stub.handshake)
+
+            def do_GET(self):
+                stub.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{self.host}:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def bench_http_client(tool, count=300, retried=20, parallel=64, per_host=4):
+    # Sequential GETs with a fresh connection each (bare requests.get) vs the pooled client;
+    # then 429/503 retries, the per-host cap under a burst of threads, and the async front end
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+
+    with StubHTTP() as stub:
+        start = time.perf_counter()
+        for i in range(count):
+            requests.get(f"{stub.url}/ok/{i}", timeout=5).raise_for_status()
+        bare = time.perf_counter() - start
+        report("http-bare", count, bare, connections=stub.connections)
+
+        client = tool.HTTPClient(per_host=per_host, backoff=0.01)
+        connections = stub.connections
+        samples = []
+        get = timed(samples, client.get)
+        start = time.perf_counter()
+        for i in range(count):
+            get(f"{stub.url}/ok/{i}").raise_for_status()
+        pooled = time.perf_counter() - start
+        report("http-pooled", count, pooled, latencies=samples, connections=stub.connections - connections, speedup=round(bare / pooled, 1))
+        if stub.connections - connections > 1:
+            raise AssertionError(f"http-client: {stub.connections - connections} connections for sequential requests")
+
+        start = time.perf_counter()
+        statuses = [client.get(f"{stub.url}/flaky/{i}").status_code for i in range(retried)]
+        statuses.append(client.get(f"{stub.url}/limited/0").status_code)
+        elapsed = time.perf_counter() - start
+        report("http-retry", retried + 1, elapsed, retried=client.retried, waited_s=round(client.waited, 2))
+        if statuses != [200] * (retried + 1) or client.retried != retried + 1 or elapsed < stub.retry_after:
+            raise AssertionError(f"http-client: retries {client.retried}, statuses {set(statuses)}, {elapsed:.2f}s")
+
+        stub.peak = 0
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            start = time.perf_counter()
+            list(pool.map(lambda i: client.get(f"{stub.url}/burst/{i}").raise_for_status(), range(count)))
+            elapsed = time.perf_counter() - start
+        report("http-burst", count, elapsed, threads=parallel, peak_per_host=stub.peak)
+        if stub.peak > per_host:
+            raise AssertionError(f"http-client: {stub.peak} requests at once, limit {per_host}")
+
+        async def fetch_all():
+            async with tool.AsyncHTTPClient(client) as async_client:
+                return await asyncio.gather(*(async_client.get(f"{stub.url}/async/{i}") for i in range(count)))
+
+        start = time.perf_counter()
+        responses = asyncio.run(fetch_all())
+        report("http-async", count, time.perf_counter() - start, peak_per_host=stub.peak)
+        if any(response.status_code != 200 for response in responses):
+            raise AssertionError("http-client: async requests failed")
+        client.close()
+
+
+def bench_ip_batch(tool, count=6000, limit=15, window=1.0):
+    # 60 batches against 15 requests/s: bounded by the rate limit, so the check is that
+    # the scheduler gets close to it without tripping a single 429
+    addresses = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(count)]
+    samples = []
+    post = tool._ip_api_post
+    tool._ip_api_post = timed(samples, post)
+    with StubIPAPI(limit=limit, window=window) as stub:
+        tool.IP_API_URL = stub.url
+        start = time.perf_counter()
+        try:
+            results = list(tool.ip_api_batch(addresses))
+        finally:
+            tool._ip_api_post = post
+        elapsed = time.perf_counter() - start
+
+    if [result["query"] for result in results] != addresses:
+        raise AssertionError("ip-batch: results missing or out of order")
+    if stub.rejected:
+        raise AssertionError(f"ip-batch: {stub.rejected} requests rejected with 429")
+    batches = -(-count // tool.IP_API_BATCH)
+    report("ip-batch", count, elapsed, latencies=samples, requests=stub.requests, ideal_s=round((batches - 1) // limit * window, 1))
+
+
+def bench_ip_lookup(tool, count=300, latency=0.005):
+    # One GET /json/<ip> per lookup_ip() call through the shared client; the cache points
+    # at a scratch database so every address is a miss
+    addresses = [f"10.8.{i // 256}.{i % 256}" for i in range(count)]
+    samples = []
+    lookup = timed(samples, tool.lookup_ip)
+    saved = tool.ip_cache
+    with tempfile.TemporaryDirectory() as tmp, StubIPAPI(limit=count * 2, latency=latency) as stub:
+        tool.IP_API_URL = stub.url
+        tool.ip_cache = tool.IPCache(os.path.join(tmp, "ip_cache.db"))
+        try:
+            start = time.perf_counter()
+            results = [lookup(address) for address in addresses]
+            elapsed = time.perf_counter() - start
+        finally:
+            tool.ip_cache.close()
+            tool.ip_cache = saved
+
+    if stub.requests != count or results[7].query != addresses[7] or results[7].city != "Stub":
+        raise AssertionError(f"ip-lookup: {stub.requests} requests, {results[7].to_dict()}")
+    report("ip-lookup", count, elapsed, latencies=samples, rtt_ms=latency * 1000)
+
+
+def bench_ip_cache(tool, count=2000, repeats=50):
+    # First pass fills the cache through the stub API, the second must not send a request;
+    # then per-lookup cost of the memory tier and of the SQLite tier (fresh instance)
+    addresses = [f"10.9.{i // 256}.{i % 256}" for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp, StubIPAPI(limit=1000) as stub:
+        tool.IP_API_URL = stub.url
+        cache = tool.IPCache(os.path.join(tmp, "ip_cache.db"))
+        list(tool.ip_api_lookup_many(addresses, cache))
+        first_requests = stub.requests
+        again = list(tool.ip_api_lookup_many(addresses, cache))
+        if stub.requests != first_requests or again[7]["query"] != addresses[7]:
+            raise AssertionError(f"ip-cache: {stub.requests - first_requests} requests for cached addresses")
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for address in addresses:
+                cache.get(address)
+        memory = time.perf_counter() - start
+        report("ip-cache-memory", count * repeats, memory, us_per_lookup=round(memory / (count * repeats) * 1e6, 2))
+
+        cold = tool.IPCache(cache.path)
+        start = time.perf_counter()
+        for address in addresses:
+            cold.get(address)
+        disk = time.perf_counter() - start
+        if cold.disk_hits != count:
+            raise AssertionError(f"ip-cache: {cold.disk_hits}/{count} found on disk")
+        report("ip-cache-disk", count, disk, us_per_lookup=round(disk / count * 1e6, 1), api_requests=first_requests)
+        cache.close()
+        cold.close()
+
+
+def write_geo_csv(path, ranges=200000, locations=5000):
+    # Contiguous /24-sized IPv4 ranges from 1.0.0.0 with gaps every 10th range, plus a few IPv6 networks
+    rng = random.Random(98)
+    places = [(f"Country{i % 200}", f"C{i % 200:03d}", f"Region{i % 900}", f"City{i}", round(rng.uniform(-80, 80), 4),
+               round(rng.uniform(-170, 170), 4), f"AS{64512 + i % 1000} Net{i % 1000}", i % 7 == 0) for i in range(locations)]
+    with open(path, "w", newline="") as f:
+        f.write("start_ip,end_ip,country,countryCode,regionName,city,lat,lon,as,hosting\n")
+        for i in range(ranges):
+            if i % 10 == 9:
+                continue
+            start = (1 << 24) + i * 256
+            place = places[i % locations]
+            f.write(f"{start},{start + 255},{place[0]},{place[1]},{place[2]},{place[3]},{place[4]},{place[5]},{place[6]},{int(place[7])}\n")
+        for i in range(100):
+            f.write(f"2001:db8:{i:x}::,2001:db8:{i:x}:ffff:ffff:ffff:ffff:ffff,CountryV6,V6,,,,,AS65000 V6,0\n")
+    return places
+
+
+def bench_geo(tool, ranges=200000, lookups=1000000):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "ranges.csv")
+        places = write_geo_csv(csv_path, ranges)
+
+        start = time.perf_counter()
+        tool.compile_geo_csv(csv_path, csv_path + ".98kgeo")
+        report("geo-compile", ranges, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        db = tool.open_geo_db(csv_path)
+        cold = time.perf_counter() - start
+
+        found = db.lookup(f"1.0.{5}.{77}")
+        if found["city"] != places[5][3] or found["lat"] != places[5][4] or found["hosting"] != places[5][7]:
+            raise AssertionError(f"geo: wrong record {found}")
+        if db.lookup("1.0.9.1")["status"] != "fail" or db.lookup("2001:db8:5::1")["country"] != "CountryV6":
+            raise AssertionError("geo: gaps or IPv6 ranges answered wrong")
+
+        rng = random.Random(1)
+        numbers = [(1 << 24) + rng.randrange(ranges * 256) for _ in range(lookups)]
+        record_id = db.record_id
+        start = time.perf_counter()
+        for number in numbers:
+            record_id(number)
+        elapsed = time.perf_counter() - start
+        report("geo-lookup-int", lookups, elapsed, ranges=db.ranges, cold_open_ms=round(cold * 1000, 2))
+
+        start = time.perf_counter()
+        bulk = db.record_ids(numbers)
+        elapsed = time.perf_counter() - start
+        if bulk[:1000] != [-1 if found is None else found for found in map(record_id, numbers[:1000])]:
+            raise AssertionError("geo: bulk and single lookups disagree")
+        report("geo-lookup-bulk", lookups, elapsed)
+
+        addresses = [socket.inet_ntoa(number.to_bytes(4, "big")) for number in numbers[:lookups // 4]]
+        lookup = db.lookup
+        start = time.perf_counter()
+        for address in addresses:
+            lookup(address)
+        report("geo-lookup", len(addresses), time.perf_counter() - start)
+        db.close()
+
+
+class NullWriter:
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+
+    def flush(self):
+        pass
+
+
+def write_access_log(path, lines, distinct=20000):
+    rng = random.Random(13)
+    with gzip.open(path, "wt") as f:
+        for i in range(lines):
+            address = f"1.0.{rng.randrange(distinct) // 256}.{rng.randrange(256)}" if i % 50 else f"2001:db8:{i % 100:x}::{i % 7:x}"
+            f.write(f'{address} - - [10/Oct/2026:13:55:{i % 60:02d} +0000] "GET /item/{i} HTTP/1.1" 200 {i % 5000} "-" "bench/1.0"\n')
+
+
+def bench_log_enrich(tool, lines=200000):
+    # Offline geo DB so the run measures the pipeline itself; peak traced memory for a 10x
+    # larger log must stay about the same, since only one window is held at a time
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "ranges.csv")
+        write_geo_csv(csv_path, 20000, 500)
+        tool.geo_db = tool.open_geo_db(csv_path)
+        small, large = os.path.join(tmp, "small.log.gz"), os.path.join(tmp, "large.log.gz")
+        write_access_log(small, lines // 10)
+        write_access_log(large, lines)
+
+        stats = {}
+        start = time.perf_counter()
+        tool.enrich_log(large, NullWriter(), stats=stats)
+        elapsed = time.perf_counter() - start
+        if stats["lines"] != lines or stats["addresses"] != lines:
+            raise AssertionError(f"log-enrich: {stats}")
+
+        peaks = []
+        for path in (small, large):
+            tracemalloc.start()
+            tool.enrich_log(path, NullWriter())
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        tool.geo_db.close()
+        tool.geo_db = None
+    if peaks[1] > peaks[0] * 1.5:
+        raise AssertionError(f"log-enrich: peak memory grew from {peaks[0]} to {peaks[1]} bytes")
+    report("log-enrich", lines, elapsed, lookups=stats["lookups"], peak_kb_small=peaks[0] // 1024, peak_kb_large=peaks[1] // 1024)
+
+
+def write_jpeg_corpus(root, count=300, size=(320, 240)):
+    # Small JPEGs spread over nested folders; every image has camera tags, two in three have GPS.
+    # Orientation, ISO and lens vary per image, one GPS fix in five also carries an altitude
+    # (every other one below sea level).
+    from PIL import Image
+    from PIL.TiffImagePlugin import IFDRational
+
+    rng = random.Random(14)
+    paths = []
+    for i in range(count):
+        folder = os.path.join(root, f"{i % 7}", f"{i % 3}")
+        os.makedirs(folder, exist_ok=True)
+        exif = Image.Exif()
+        exif[271] = f"Maker{i % 4}"
+        exif[272] = f"Model {i % 9}"
+        exif[306] = f"2026:01:{i % 28 + 1:02d} 12:00:00"
+        details = exif.get_ifd(0x8769)
+        details[33434] = IFDRational(1, 125 * (i % 4 + 1))
+        details[33437] = IFDRational(28, 10)
+        details[36867] = f"2026:01:{i % 28 + 1:02d} 12:00:00"
+        details[34855] = 100 * 2 ** (i % 6)
+        exif[274] = (1, 3, 6, 8)[i % 4]
+        if i % 2:
+            details[42036] = f"Lens {i % 5} {18 + i % 5 * 12}mm"
+        if i % 3:
+            lat, lon = rng.uniform(-60, 60), rng.uniform(-170, 170)
+            gps = exif.get_ifd(0x8825)
+            gps.update({
+                1: "N" if lat >= 0 else "S", 2: tuple(IFDRational(part) for part in _dms(abs(lat))),
+                3: "E" if lon >= 0 else "W", 4: tuple(IFDRational(part) for part in _dms(abs(lon))),
+            })
+            if i % 5 == 0:
+                gps.update({5: i % 2, 6: IFDRational(round(rng.uniform(0, 3000), 1))})
+        path = os.path.join(folder, f"IMG_{i:05d}.jpg")
+        Image.new("RGB", size, (i * 7 % 256, i * 13 % 256, i * 29 % 256)).save(path, quality=80, exif=exif)
+        paths.append(path)
+    return paths
+
+
+def _dms(value):
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 2)
+    return degrees, minutes, seconds
+
+
+def bench_exif_batch(tool, count=600):
+    with tempfile.TemporaryDirectory() as tmp:
+        write_jpeg_corpus(tmp, count)
+        for workers in sorted({1, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            records = list(tool.exif_batch(tool.iter_images(tmp), workers=workers))
+            elapsed = time.perf_counter() - start
+            with_gps = sum(1 for record in records if record.gps)
+            if len(records) != count or with_gps != count - -(-count // 3) or any(record.error for record in records):
+                raise AssertionError(f"exif-batch: {len(records)} records, {with_gps} with GPS")
+            report("exif-batch", count, elapsed, workers=workers)
+
+
+def bench_exif_dedup(tool, unique=100, copies=5):
+    # Every image copied `copies` times, plus same-size files that differ only in their last
+    # bytes (caught by the full hash, since DEDUP_HEAD is lowered below the file size).
+    # With dedup each distinct file must be parsed exactly once and every copy must point at it.
+    import shutil
+
+    with tempfile.TemporaryDirectory() as tmp:
+        originals = write_jpeg_corpus(os.path.join(tmp, "a"), unique)
+        for n in range(1, copies):
+            for i, path in enumerate(originals):
+                shutil.copyfile(path, os.path.join(tmp, f"copy{n}_{i}.jpg"))
+        for i, path in enumerate(originals[:10]):
+            with open(path, "rb") as f:
+                data = bytearray(f.read())
+            data[-3] ^= 0xFF
+            with open(os.path.join(tmp, f"near_{i}.jpg"), "wb") as f:
+                f.write(data)
+        total = unique * copies + 10
+        distinct = unique + 10
+
+        parsed = []
+        extract = tool.extract_image_metadata
+        tool.extract_image_metadata = lambda path: parsed.append(path) or extract(path)
+        head, tool.DEDUP_HEAD = tool.DEDUP_HEAD, 1024
+        try:
+            timings = {}
+            for dedup in (False, True):
+                parsed.clear()
+                start = time.perf_counter()
+                records = list(tool.exif_batch(tool.iter_images(tmp), workers=1, dedup=dedup))
+                timings[dedup] = time.perf_counter() - start
+                report("exif-dedup" if dedup else "exif-nodedup", total, timings[dedup], parsed=len(parsed))
+        finally:
+            tool.extract_image_metadata = extract
+            tool.DEDUP_HEAD = head
+
+        by_path = {record.path: record for record in records}
+        copies_found = [record for record in records if record.duplicate_of]
+        if len(records) != total or len(parsed) != distinct or len(copies_found) != total - distinct:
+            raise AssertionError(f"exif-dedup: {len(records)} records, {len(parsed)} parsed, {len(copies_found)} copies")
+        for record in copies_found:
+            canonical = by_path[record.duplicate_of]
+            if canonical.duplicate_of or os.path.getsize(record.path) != os.path.getsize(canonical.path) or \
+                    dict(record.to_dict(), path=None, duplicate_of=None) != dict(canonical.to_dict(), path=None, duplicate_of=None):
+                raise AssertionError(f"exif-dedup: {record.path} is not a copy of {record.duplicate_of}")
+
+        index = tool.MetadataIndex(os.path.join(tmp, "index.db"))
+        try:
+            counts = index.update(tmp, workers=1, hash_files=True)
+            groups = index.duplicates()
+            if counts["duplicates"] != total - distinct or len(groups) != unique:
+                raise AssertionError(f"exif-dedup: index {counts}, {len(groups)} groups")
+        finally:
+            index.close()
+
+
+def bench_exif_header(tool, count=400):
+    # Same corpus through the header-only reader and through Pillow: results must match,
+    # and the header reader has to be clearly faster and allocate less per file
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_jpeg_corpus(tmp, count, size=(1600, 1200))
+        timings = {}
+        peaks = {}
+        for name, reader in (("header", tool.read_exif), ("pil", tool.read_exif_pil)):
+            start = time.perf_counter()
+            results = [reader(path) for path in paths]
+            timings[name] = time.perf_counter() - start
+            tracemalloc.start()
+            for path in paths[:50]:
+                reader(path)
+            peaks[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if name == "header":
+                expected = json.dumps([[tool._json_safe(part) for part in result] for result in results], sort_keys=True)
+            elif json.dumps([[tool._json_safe(part) for part in result] for result in results], sort_keys=True) != expected:
+                raise AssertionError("exif-header: header reader and Pillow disagree")
+
+    speedup = timings["pil"] / timings["header"]
+    report("exif-header", count, timings["header"], us_per_file=round(timings["header"] / count * 1e6), peak_kb=peaks["header"] // 1024)
+    report("exif-pil", count, timings["pil"], us_per_file=round(timings["pil"] / count * 1e6), peak_kb=peaks["pil"] // 1024)
+    if speedup < 2:
+        raise AssertionError(f"exif-header: only {speedup:.1f}x faster than Pillow")
+
+
+def bench_imgmeta(tool, count=400):
+    # Extraction alone vs the renderers fed from the same ImageMetadata records: the rich
+    # panel goes to a throwaway Console, JSONL and CSV to a NullWriter. JSON must round-trip.
+    from rich.console import Console
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_jpeg_corpus(tmp, count)
+        samples = []
+        extract = timed(samples, tool.extract_image_metadata)
+        start = time.perf_counter()
+        records = [extract(path) for path in paths]
+        elapsed = time.perf_counter() - start
+        report("imgmeta-extract", count, elapsed, latencies=samples, us_per_file=round(elapsed / count * 1e6))
+        if any(json.loads(json.dumps(meta.to_dict())) != tool.exif_record(meta.path) for meta in records[:20]):
+            raise AssertionError("imgmeta: to_dict() and exif_record() disagree")
+
+    saved = tool.console
+    tool.console = Console(file=NullWriter(), width=120, force_terminal=True)
+    try:
+        start = time.perf_counter()
+        for meta in records:
+            tool.render_image_rich(meta)
+        report("imgmeta-rich", count, time.perf_counter() - start)
+    finally:
+        tool.console = saved
+
+    for name, render in (("imgmeta-json", tool.render_json), ("imgmeta-csv", tool.render_csv)):
+        start = time.perf_counter()
+        render(records, NullWriter())
+        report(name, count, time.perf_counter() - start)
+
+
+def bench_image_index(tool, count=600, queries=200):
+    # Full index, no-op re-index, then 10 touched (same bytes), 10 rewritten, 10 deleted and
+    # 10 new files: only the rewritten and new ones may be parsed again
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "photos")
+        paths = write_jpeg_corpus(root, count)
+        index = tool.MetadataIndex(os.path.join(tmp, "index.db"))
+
+        start = time.perf_counter()
+        first = index.update(root, hash_files=True)
+        report("index-full", count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        again = index.update(root, hash_files=True)
+        report("index-noop", count, time.perf_counter() - start, parsed=again["added"] + again["updated"])
+
+        for path in paths[:10]:
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        for path in paths[10:20]:
+            with open(path, "r+b") as f:
+                f.seek(-4, 2)
+                f.write(b"\x00\x00\xff\xd9")
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        for path in paths[20:30]:
+            os.remove(path)
+        write_jpeg_corpus(os.path.join(root, "new"), 10)
+        start = time.perf_counter()
+        delta = index.update(root, hash_files=True)
+        report("index-delta", count, time.perf_counter() - start, **delta)
+        if first["added"] != count or again["added"] + again["updated"] or \
+                (delta["added"], delta["updated"], delta["removed"]) != (10, 10, 10):
+            raise AssertionError(f"image-index: {first} / {again} / {delta}")
+
+        start = time.perf_counter()
+        for i in range(queries):
+            rows = index.query(model=f"model {i % 9}", since="2026-01-05", until="2026-01-20")
+        elapsed = time.perf_counter() - start
+        if not rows or any(not "2026-01-05" <= row["taken"] <= "2026-01-20 99" for row in rows):
+            raise AssertionError("image-index: query returned wrong rows")
+        report("index-query", queries, elapsed, ms_per_query=round(elapsed / queries * 1000, 2), rows=len(rows))
+        index.close()
+
+
+def bench_gps_query(tool, points=500000, queries=20):
+    # Random worldwide points; every answer is checked against a brute-force haversine
+    import numpy
+
+    rng = numpy.random.default_rng(17)
+    latitudes = numpy.degrees(numpy.arcsin(rng.uniform(-1, 1, points)))
+    longitudes = rng.uniform(-180, 180, points)
+    paths = [f"/photos/{i:07d}.jpg" for i in range(points)]
+
+    start = time.perf_counter()
+    geo = tool.GeoPoints(paths, latitudes, longitudes)
+    report("gps-build", points, time.perf_counter() - start)
+
+    def brute(lat, lon):
+        lat1, lat2 = numpy.radians(lat), numpy.radians(latitudes)
+        a = numpy.sin((lat2 - lat1) / 2) ** 2 + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin(numpy.radians(longitudes - lon) / 2) ** 2
+        return 2 * tool.EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+    centers = [(45.46, 9.19), (-33.87, 151.21), (64.1, -21.9), (0.0, 179.9), (89.5, 10.0)]
+    for km in (50, 500, 2000):
+        start = time.perf_counter()
+        results = [geo.within_radius(lat, lon, km) for _ in range(queries // len(centers)) for lat, lon in centers]
+        elapsed = time.perf_counter() - start
+        for (lat, lon), found in zip(centers, results):
+            expected = int((brute(lat, lon) <= km).sum())
+            if len(found) != expected:
+                raise AssertionError(f"gps-query: {len(found)} != {expected} within {km} km of {lat},{lon}")
+        report(f"gps-radius-{km}km", len(results), elapsed, ms_per_query=round(elapsed / len(results) * 1000, 2),
+               hits=sum(len(found) for found in results) // len(results))
+
+    start = time.perf_counter()
+    boxed = geo.within_box(35.0, 170.0, 60.0, -170.0)
+    elapsed = time.perf_counter() - start
+    expected = int(((latitudes >= 35) & (latitudes <= 60) & ((longitudes >= 170) | (longitudes <= -170))).sum())
+    if len(boxed) != expected:
+        raise AssertionError(f"gps-query: box {len(boxed)} != {expected}")
+    report("gps-box", 1, elapsed, hits=len(boxed))
+
+    start = time.perf_counter()
+    for _ in range(3):
+        [path for path, lat, lon in zip(paths, latitudes.tolist(), longitudes.tolist())
+         if 35 <= lat <= 60 and (lon >= 170 or lon <= -170)]
+    report("gps-box-python-loop", 3, time.perf_counter() - start)
+
+
+# Time to load 98kTools.py in a fresh interpreter (interpreter startup excluded), in ms
+def bench_metrics(tool, calls=1000000, files=400):
+    # Hooks with metrics off must cost next to nothing against the work they instrument (one
+    # EXIF parse here); with metrics on, the exports must agree with what was recorded
+    metrics = tool.metrics
+    metrics.enabled = False
+    start = time.perf_counter()
+    for _ in range(calls):
+        metrics.count("off_total")
+        with metrics.timer("off_seconds"):
+            pass
+    elapsed = time.perf_counter() - start
+    off_ns = elapsed / calls * 1e9
+    report("metrics-off", calls, elapsed, ns_per_hook=round(off_ns / 2))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_jpeg_corpus(tmp, files)
+        timings = {}
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            start = time.perf_counter()
+            for path in paths:
+                tool.extract_image_metadata(path)
+            timings[enabled] = time.perf_counter() - start
+        report("metrics-on-exif", files, timings[True], overhead_pct=round((timings[True] / timings[False] - 1) * 100, 1))
+        if metrics.counters or metrics.histograms["exif_parse_seconds"].count != files:
+            raise AssertionError(f"metrics: {metrics.to_dict()['counters']}, histograms {list(metrics.histograms)}")
+
+        metrics.count("bench_total", 3)
+        data = metrics.to_dict()
+        text = metrics.to_prometheus()
+        buckets = [int(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith("multitool_exif_parse_seconds_bucket")]
+        if buckets != sorted(buckets) or buckets[-1] != files or "multitool_bench_total 3" not in text:
+            raise AssertionError("metrics: Prometheus export does not match the recorded values")
+        if sum(data["histograms"]["exif_parse_seconds"]["buckets"].values()) != files:
+            raise AssertionError("metrics: JSON buckets do not add up")
+    metrics.enabled = False
+    metrics.reset()
+
+    per_file_ns = timings[False] / files * 1e9
+    if off_ns > per_file_ns * 0.01:
+        raise AssertionError(f"metrics: {off_ns:.0f} ns of disabled hooks per {per_file_ns:.0f} ns EXIF parse")
+
+
+def bench_jobs(tool, count=6, latency=1.5):
+    # Shell background jobs: `count` single iplookups against a slow ip-api stand-in must
+    # overlap (well under count * latency in total, child start-up included), and cancelling
+    # a running one must stop it. Children run in a scratch directory so their caches land there.
+    saved_cwd, saved_env = os.getcwd(), dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp, StubIPAPI(limit=count * 4, latency=latency) as stub:
+        os.chdir(tmp)
+        os.environ["IP_API_URL"] = stub.url
+        manager = tool.JobManager(max_running=count)
+        try:
+            start = time.perf_counter()
+            jobs = [manager.start(["iplookup", f"10.7.0.{i}", "-f", "jsonl"]) for i in range(count)]
+            while not all(job.done for job in jobs):
+                time.sleep(0.02)
+            elapsed = time.perf_counter() - start
+
+            victim = manager.start(["iplookup", "10.7.1.1", "-f", "jsonl"])
+            while victim.state != "running" or victim.elapsed < 0.5:
+                time.sleep(0.02)
+            cancelled = time.perf_counter()
+            manager.cancel(victim)
+            while not victim.done:
+                time.sleep(0.02)
+            stopped_after = time.perf_counter() - cancelled
+        finally:
+            manager.close()
+            os.chdir(saved_cwd)
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+    records = [json.loads(job.output.read_from(0)[0]) for job in jobs]
+    if [job.state for job in jobs] != ["done"] * count or [record["query"] for record in records] != [f"10.7.0.{i}" for i in range(count)]:
+        raise AssertionError(f"jobs: {[(job.state, job.returncode) for job in jobs]}")
+    if elapsed > count * latency * 0.6:
+        raise AssertionError(f"jobs: {count} jobs took {elapsed:.1f}s, one after another would be {count * latency:.1f}s")
+    if victim.state != "cancelled" or stopped_after > latency:
+        raise AssertionError(f"jobs: cancelled job ended as {victim.state} after {stopped_after:.1f}s")
+    report("jobs", count, elapsed, sequential_s=count * latency, cancel_ms=round(stopped_after * 1000), cancelled_exit=victim.returncode)
+
+
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 150))
+# Packages that only the commands using them may import
+STARTUP_DEFERRED = ("flask", "requests", "PIL", "rich")
+
+
+def bench_startup(tool, runs=7):
+    # Loads the tool in fresh interpreters: the best of `runs` must fit the budget, and an
+    # -X importtime run must not show any of the deferred packages
+    code = (
+        "import importlib.util, time\n"
+        "start = time.perf_counter()\n"
+        f"spec = importlib.util.spec_from_file_location('tool98k', {os.path.join(HERE, '98kTools.py')!r})\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout))
+
+    def top_level_imports(source):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", source], capture_output=True, text=True, check=True)
+        imports = []
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                name = parts[2].rstrip()
+                # Nested imports are indented under their parent
+                if not name[1:2].isspace():
+                    imports.append((int(parts[1]), name.strip()))
+        return imports
+
+    # Whatever the bare interpreter imports (site, encodings...) is not the tool's doing
+    baseline = {name for _, name in top_level_imports("pass")}
+    imports = [(us, name) for us, name in top_level_imports(code) if name not in baseline]
+    loaded = sorted({name.split(".")[0] for _, name in imports} & set(STARTUP_DEFERRED))
+    slowest = ", ".join(f"{name}={us // 1000}ms" for us, name in sorted(imports, reverse=True)[:3])
+
+    best = min(timings)
+    report("startup", runs, sum(timings) / 1000, best_ms=round(best, 1), budget_ms=STARTUP_BUDGET_MS, slowest=slowest)
+    if loaded:
+        raise AssertionError(f"startup: {', '.join(loaded)} imported at load time")
+    if best > STARTUP_BUDGET_MS:
+        raise AssertionError(f"startup: {best:.0f} ms, budget {STARTUP_BUDGET_MS:.0f} ms")
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "portscan": bench_portscan,
+    "portscan-blackhole": bench_portscan_blackhole,
+    "portscan-latency": bench_portscan_latency,
+    "portscan-hosts": bench_portscan_hosts,
+    "banners": bench_banners,
+    "dns": bench_dns,
+    "dns-bulk": bench_dns_bulk,
+    "dns-sweep": bench_dns_sweep,
+    "http-client": bench_http_client,
+    "ip-batch": bench_ip_batch,
+    "ip-lookup": bench_ip_lookup,
+    "ip-cache": bench_ip_cache,
+    "geo": bench_geo,
+    "log-enrich": bench_log_enrich,
+    "exif-batch": bench_exif_batch,
+    "exif-dedup": bench_exif_dedup,
+    "exif-header": bench_exif_header,
+    "imgmeta": bench_imgmeta,
+    "image-index": bench_image_index,
+    "gps-query": bench_gps_query,
+    "metrics": bench_metrics,
+    "jobs": bench_jobs,
+}
+
+
+BASELINE_FILE = os.environ.get("BENCH_BASELINE", os.path.join(HERE, "bench_baseline.json"))
+# Allowed drift before a metric counts as a regression: throughput may drop and latency or
+# memory grow by this fraction. Latency changes under LATENCY_FLOOR_MS are noise.
+BENCH_TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", 0.3))
+LATENCY_FLOOR_MS = 1.0
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_child(name, results_path):
+    # One benchmark in this process; its metrics and peak RSS go to results_path as JSON
+    tool = load_tool()
+    BENCHMARKS[name](tool)
+    with open(results_path, "w") as f:
+        json.dump({"peak_rss_kb": peak_rss_kb(), "results": RESULTS}, f)
+    return 0
+
+
+def run_isolated(name):
+    # Each benchmark gets a fresh interpreter, so peak RSS belongs to that benchmark alone
+    # and no state (caches, globals patched by an earlier one) leaks between them
+    with tempfile.TemporaryDirectory() as tmp:
+        results_path = os.path.join(tmp, "results.json")
+        code = subprocess.call([sys.executable, os.path.abspath(__file__), "--child", name, results_path])
+        if code or not os.path.exists(results_path):
+            return None
+        with open(results_path) as f:
+            return json.load(f)
+
+
+def regressions(current, baseline, tolerance):
+    # (benchmark, metric, baseline value, current value) for everything outside tolerance
+    found = []
+    for name, run in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if run["peak_rss_kb"] and base.get("peak_rss_kb") and run["peak_rss_kb"] > base["peak_rss_kb"] * (1 + tolerance):
+            found.append((name, "peak_rss_kb", base["peak_rss_kb"], run["peak_rss_kb"]))
+        for label, metrics in run["results"].items():
+            before = base["results"].get(label, {})
+            for metric, value in metrics.items():
+                old = before.get(metric)
+                if old is None:
+                    continue
+                if metric == "ops_per_s":
+                    worse = value < old * (1 - tolerance)
+                else:
+                    worse = value > old * (1 + tolerance) and value - old > LATENCY_FLOOR_MS
+                if worse:
+                    found.append((label, metric, old, value))
+    return found
+
+
+def main(argv):
+    if argv[:1] == ["--child"]:
+        return run_child(argv[1], argv[2])
+
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline benchmarks for 98kTools.py")
+    parser.add_argument("names", nargs="*", metavar="benchmark", help="benchmarks to run (default: all)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE, help="allowed drift, as a fraction (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}. Available: {', '.join(BENCHMARKS)}")
+        return 2
+
+    current = {}
+    failed = []
+    for name in names:
+        run = run_isolated(name)
+        if run is None:
+            failed.append(name)
+        else:
+            current[name] = run
+            print(f"{name:<24} peak_rss_kb={run['peak_rss_kb']}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(current)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Baseline for {len(current)} benchmark(s) saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        worse = regressions(current, baseline, args.tolerance)
+        for label, metric, old, value in worse:
+            print(f"REGRESSION {label:<24} {metric:<12} {old} -> {value} ({(value - old) / old * 100:+.0f}%)")
+        missing = [name for name in current if name not in baseline]
+        print(f"Compared with {args.baseline}: {len(worse)} regression(s), tolerance {args.tolerance:.0%}"
+              + (f", no baseline for {', '.join(missing)}" if missing else ""))
+        if worse:
+            failed.append("baseline")
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if failed:
+        print(f"FAILED: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))